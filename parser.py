@@ -33,6 +33,7 @@
 from __future__ import annotations
 
 import re
+import sys
 from enum import Enum
 from typing import Any, Iterable, Iterator
 
@@ -41,7 +42,6 @@ RE_TARGET_FILENAME = re.compile(r'^\+\+\+ (?P<filename>[^\t]+)')
 
 # @@ (source offset, length) (target offset, length) @@
 RE_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))?\ @@")
-RE_HUNK_BODY_LINE = re.compile(r'^([- \+\\])')
 
 
 class LineType(Enum):
@@ -51,6 +51,10 @@ class LineType(Enum):
     IGNORE = '\\'  # No newline case (ignore)
 
 
+# Maps the first character of a hunk body line to its type
+LINE_TYPES = {t.value: t for t in LineType}
+
+
 class UnidiffParseError(Exception):
     pass
 
@@ -94,13 +98,16 @@ class PatchedFile(list["Hunk"]):
         self.target_file = target
 
         if self.source_file.startswith('a/') and self.target_file.startswith('b/'):
-            self.path = self.source_file[2:]
+            path = self.source_file[2:]
         elif self.source_file.startswith('a/') and self.target_file == '/dev/null':
-            self.path = self.source_file[2:]
+            path = self.source_file[2:]
         elif self.target_file.startswith('b/') and self.source_file == '/dev/null':
-            self.path = self.target_file[2:]
+            path = self.target_file[2:]
         else:
-            self.path = self.source_file
+            path = self.source_file
+        # The same path shows up in many patches and is used as a dict
+        # key by the analyzers, so share a single string object for it
+        self.path = sys.intern(path)
 
 
 class Hunk:
@@ -120,14 +127,17 @@ class Hunk:
     def append_line(self, line: Line) -> None:
         """Append a line."""
         self.changes.append(line)
+        self.count_line(line.action)
 
-        if line.action in {LineType.CONTEXT, LineType.DELETE}:
+    def count_line(self, action: LineType) -> None:
+        """Count a line of the given type against the header lengths."""
+        if action is LineType.CONTEXT or action is LineType.DELETE:
             self.source_todo -= 1
             if self.source_todo < 0:
                 raise UnidiffParseError(
                     f'Too many source lines in hunk: {self}')
 
-        if line.action in {LineType.CONTEXT, LineType.ADD}:
+        if action is LineType.CONTEXT or action is LineType.ADD:
             self.target_todo -= 1
             if self.target_todo < 0:
                 raise UnidiffParseError(
@@ -149,9 +159,8 @@ def _parse_hunk(
     target_lineno = 0
 
     for line in diff:
-        valid_line = RE_HUNK_BODY_LINE.match(line)
-        if valid_line:
-            action = LineType(valid_line.group(0))
+        action = LINE_TYPES.get(line[:1])
+        if action is not None:
             original_line = line[1:]
 
             kwargs: dict[str, Any] = {
@@ -192,13 +201,17 @@ def parse_diff(diff: Iterable[str]) -> list[PatchedFile]:
     # from the top inside _parse_hunk
     lines = iter(diff)
     for line in lines:
-        if m := RE_SOURCE_FILENAME.match(line):
+        # Dispatch on the first character, so the bulk of the lines
+        # outside of hunks (commit messages, git extended headers)
+        # never need to try any of the regexes
+        first = line[:1]
+        if first == '-' and (m := RE_SOURCE_FILENAME.match(line)):
             source_file = m['filename']
-        elif m := RE_TARGET_FILENAME.match(line):
+        elif first == '+' and (m := RE_TARGET_FILENAME.match(line)):
             target_file = m['filename']
             current_file = PatchedFile(source_file, target_file)
             ret.append(current_file)
-        elif m := RE_HUNK_HEADER.match(line):
+        elif first == '@' and (m := RE_HUNK_HEADER.match(line)):
             hunk = _parse_hunk(
                 lines,
                 int(m[1]),
@@ -211,5 +224,56 @@ def parse_diff(diff: Iterable[str]) -> list[PatchedFile]:
     return ret
 
 
+def _skip_hunk(
+    diff: Iterator[str],
+    source_start: int,
+    source_len: int,
+    target_start: int,
+    target_len: int,
+) -> None:
+    """
+    Like _parse_hunk, but only consumes the hunk lines. They are
+    still counted by an (empty) Hunk, so malformed hunks raise the
+    same errors.
+    """
+    hunk = Hunk(source_start, source_len, target_start, target_len)
+
+    for line in diff:
+        action = LINE_TYPES.get(line[:1])
+        if action is None:
+            raise UnidiffParseError(f'Hunk diff data expected: {line}')
+        hunk.count_line(action)
+
+        if hunk.is_valid():
+            break
+
+
+def parse_paths(diff: Iterable[str]) -> list[str]:
+    """
+    Returns the paths of the files patched by the given diff, in the
+    same order as parse_diff would return them, without building the
+    hunks.
+    """
+    ret: list[str] = []
+
+    lines = iter(diff)
+    for line in lines:
+        first = line[:1]
+        if first == '-' and (m := RE_SOURCE_FILENAME.match(line)):
+            source_file = m['filename']
+        elif first == '+' and (m := RE_TARGET_FILENAME.match(line)):
+            ret.append(PatchedFile(source_file, m['filename']).path)
+        elif first == '@' and (m := RE_HUNK_HEADER.match(line)):
+            _skip_hunk(
+                lines,
+                int(m[1]),
+                _int1(m[2]),
+                int(m[3]),
+                _int1(m[4]),
+            )
+
+    return ret
+
+
 def _int1(s: str) -> int:
     return 1 if s is None else int(s)
@@ -30,15 +30,16 @@
 from __future__ import annotations
 
 import argparse
+import bisect
 import collections
-import itertools
+import operator
 import os
 import subprocess
 import sys
 import textwrap
 from enum import Enum
-from parser import LineType, parse_diff
-from typing import TYPE_CHECKING, Iterable, Iterator
+from parser import LineType, parse_diff, parse_paths
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator
 
 if TYPE_CHECKING:
     from parser import Hunk, PatchedFile
@@ -59,6 +60,10 @@ class Depend(Enum):
 
 
 class Changeset:
+    # How this changeset is shown. Set once by the subclasses, since
+    # patches are printed many times
+    name: str
+
     def get_patch_set(self) -> list[PatchedFile]:
         """
         Returns this changeset as a list of PatchedFiles.
@@ -68,13 +73,28 @@ class Changeset:
             sys.stderr.write(f"WARNING: Parsing diff {self} produced no patch hunks, maybe format is invalid?\n")
         return parsed
 
+    def get_paths(self) -> list[str]:
+        """
+        Returns the paths of the files changed by this changeset. This
+        is cheaper than get_patch_set, since the hunks are skipped
+        rather than parsed.
+        """
+        paths = parse_paths(self.get_diff())
+        if not paths:
+            sys.stderr.write(f"WARNING: Parsing diff {self} found no changed files, maybe format is invalid?\n")
+        return paths
+
     def get_diff(self) -> Iterable[str]:
         """
         Returns the textual unified diff for this changeset as an
-        iterable of lines
+        iterable of lines. Every changeset is parsed only once, so
+        this may only be called once.
         """
         raise NotImplementedError
 
+    def __str__(self) -> str:
+        return self.name
+
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}({self!s})"
 
@@ -82,12 +102,16 @@ class Changeset:
 class PatchFile(Changeset):
     def __init__(self, filename: str) -> None:
         self.filename = filename
+        self.name = os.path.basename(filename)
 
-    def get_diff(self) -> Iterable[str]:
-        f = open(self.filename, encoding='utf-8')
-        # Iterating over a file gives separate lines, with newlines
-        # included. We want those stripped off
-        return (line.rstrip('\n') for line in f)
+    def get_diff(self) -> Iterator[str]:
+        # Yield from within the with block, so the file is closed as
+        # soon as the parser is done with it
+        with open(self.filename, encoding='utf-8') as f:
+            # Iterating over a file gives separate lines, with newlines
+            # included. We want those stripped off
+            for line in f:
+                yield line.rstrip('\n')
 
     @staticmethod
     def get_changesets(args: Iterable[str]) -> Iterator[PatchFile]:
@@ -97,71 +121,132 @@ class PatchFile(Changeset):
         for filename in args:
             yield PatchFile(filename)
 
-    def __str__(self) -> str:
-        return os.path.basename(self.filename)
-
 
 class GitRev(Changeset):
-    def __init__(self, rev: str, msg: str) -> None:
+    def __init__(self, rev: str, msg: str, diff: bytes) -> None:
         self.rev = rev
         self.msg = msg
-
-    def get_diff(self) -> Iterable[str]:
-        diff = subprocess.check_output(['git', 'diff', '--no-color', f"{self.rev}^", self.rev])
+        self.name = f"{rev} ({msg})"
+        # The raw diff as produced by git, only decoded when parsed.
+        # Set to None once handed over to the parser.
+        self.diff: bytes | None = diff
+
+    def get_diff(self) -> Iterator[str]:
+        # Hand over the diff and drop our reference, instead of
+        # keeping the diffs of all revisions in memory until the end
+        diff, self.diff = self.diff, None
+        assert diff is not None, f"Diff of {self} was already parsed"
         # Convert to utf8 and just drop any invalid characters (we're
         # not interested in the actual file contents and all diff
-        # special characters are valid ascii).
-        return diff.decode(errors='ignore').split('\n')
-
-    def __str__(self) -> str:
-        return f"{self.rev} ({self.msg})"
+        # special characters are valid ascii). Lines are split on \n
+        # only, before decoding, so a bare \r stays part of its line.
+        return (line.decode(errors='ignore') for line in diff.split(b'\n'))
 
     @staticmethod
     def get_changesets(args: list[str]) -> Iterator[GitRev]:
         """
-        Generate Changeset objects, given arguments for git rev-list.
-        """
-        output = subprocess.check_output(['git', 'rev-list', '--oneline', '--reverse', *args])
+        Generate Changeset objects, given arguments for git log.
 
-        if not output:
+        Rather than running git diff for every revision, this runs a
+        single git log that produces the diffs of all revisions in one
+        stream. Each revision starts with a header line prefixed by a
+        NUL byte, which cannot occur in the diff output itself.
+        """
+        # Without arguments, git log would show the entire history of
+        # HEAD, which is never what was meant
+        if not args:
+            sys.exit("No revisions specified?")
+
+        cmd = ['git', 'log', '--reverse', '--patch', '--no-color',
+               '--diff-merges=first-parent', '--format=%x00%h %s', *args]
+        header: tuple[str, str] | None = None
+        diff: list[bytes] = []
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE) as proc:
+            assert proc.stdout is not None
+            for line in proc.stdout:
+                if line.startswith(b'\0'):
+                    if header is not None:
+                        changeset = GitRev(*header, b''.join(diff))
+                        # Don't keep the separate lines around while
+                        # the revision is being analyzed
+                        diff.clear()
+                        yield changeset
+                    rev, msg = line[1:].decode().rstrip('\n').split(' ', 1)
+                    header = (rev, msg)
+                else:
+                    diff.append(line)
+
+        # Check for errors first, since git also outputs nothing for an
+        # invalid revision
+        if proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+        if header is None:
             sys.stderr.write("No revisions specified?\n")
         else:
-            lines = output.decode().strip().split('\n')
-            for line in lines:
-                yield GitRev(*line.split(' ', 1))
+            yield GitRev(*header, b''.join(diff))
+
+
+def patch_numbers(patches: list[Changeset]) -> dict[Changeset, int]:
+    """
+    Returns the position of every patch in the list, to look up or
+    sort by patch order without scanning the list every time.
+    """
+    return {p: i for i, p in enumerate(patches)}
+
+
+def nonempty_depends(depends: dict[Changeset, dict[Changeset, Depend]]) -> dict[Changeset, dict[Changeset, Depend]]:
+    """
+    Returns the dependencies collected by an analyzer as a plain dict
+    (so lookups by the output functions cannot add entries), leaving
+    out patches without dependencies.
+    """
+    return {p: deps for p, deps in depends.items() if deps}
 
 
 def print_depends(patches: list[Changeset], depends: dict[Changeset, dict[Changeset, Depend]]) -> None:
+    number = patch_numbers(patches)
     for p in patches:
-        if dependencies := depends[p]:
-            print(f"{p} depends on:")
-            for dep in patches:
-                if dependency := dependencies.get(dep):
-                    desc = dependency.desc
-                    if desc:
-                        print(f"  {dep} ({desc})")
-                    else:
-                        print(f"  {dep}")
+        if dependencies := depends.get(p):
+            # Collect the lines for each patch and write them at once,
+            # which is a lot cheaper than a print call per dependency
+            out = [f"{p} depends on:\n"]
+            for dep in sorted(dependencies, key=number.__getitem__):
+                desc = dependencies[dep].desc
+                if desc:
+                    out.append(f"  {dep} ({desc})\n")
+                else:
+                    out.append(f"  {dep}\n")
+            sys.stdout.write("".join(out))
 
 
 def print_depends_tsort(patches: list[Changeset], depends: dict[Changeset, dict[Changeset, Depend]]) -> None:
+    # Tsort source has: #define DELIM " \t\n"
+    no_delim = str.maketrans(' \t\n', '___')
+    # Names are needed once for every edge, so translate them only once
+    names = {p: str(p).translate(no_delim) for p in patches}
+    number = patch_numbers(patches)
     for p in patches:
-        if dependencies := depends[p]:
-            for dep in patches:
-                if dep in dependencies:
-                    def no_delim(x):
-                        # Tsort source has: #define DELIM " \t\n"
-                        return str(x).replace(' ', '_').replace('\t', '_').replace('\n', '_')
-                    print(f"{no_delim(dep)}\t{no_delim(p)}")
+        if dependencies := depends.get(p):
+            for dep in sorted(dependencies, key=number.__getitem__):
+                print(f"{names[dep]}\t{names[p]}")
 
 
 def print_depends_matrix(patches: list[Changeset], depends: dict[Changeset, dict[Changeset, Depend]]) -> None:
     # Which patches have at least one dependency drawn (and thus
-    # need lines from then on)?
+    # need lines from then on)? And the position of the last of them
     has_deps: set[Changeset] = set()
-    prereq: set[Changeset] = {dep for p in patches for dep in depends[p]}
+    drawn_upto = -1
+    number = patch_numbers(patches)
+    # For every patch that others depend on, the position of the last
+    # patch depending on it (so we know how far its ruler extends
+    # without scanning the remaining columns for every cell)
+    last_dependent: dict[Changeset, int] = {}
+    for i, p in enumerate(patches):
+        for dep in depends.get(p, ()):
+            last_dependent[dep] = i
     # Every patch depending on other patches needs a column
-    depending: list[Changeset] = [p for p in patches if depends[p]]
+    depending: list[Changeset] = [p for p in patches if depends.get(p)]
     column = 82
     for p in patches:
         if depending and depending[0] == p:
@@ -169,63 +254,93 @@ def print_depends_matrix(patches: list[Changeset], depends: dict[Changeset, dict
             column += 2
             fill, corner = "─", "┘"
         else:
-            fill = corner = "·" if p in prereq else " "
-        line = f"{f'{p!s:.80}  ':{fill}<{column}}{corner}"
-
-        for i, dep in enumerate(depending):
+            fill = corner = "·" if p in last_dependent else " "
+        # Collect all cells of the line and join them once at the end
+        cells = [f"{f'{p!s:.80}  ':{fill}<{column}}{corner}"]
+
+        last = last_dependent.get(p, -1)
+        # Columns past both the end of the ruler and the last line
+        # drawn down are all blank, so only pad those
+        end = bisect.bisect_right(depending, max(last, drawn_upto), key=number.__getitem__)
+        for dep in depending[:end]:
             # Show ruler if a later patch depends on this one
-            ruler = "·" if any(depends[d].get(p) for d in depending[i:]) else " "
+            ruler = "·" if number[dep] <= last else " "
+            cells.append(ruler)
             # For every later patch, print an "X" if it depends on this one
             if dependency := depends[dep].get(p):
-                line += f"{ruler}{dependency.matrixmark}"
+                cells.append(dependency.matrixmark)
                 has_deps.add(dep)
+                drawn_upto = max(drawn_upto, number[dep])
             elif dep in has_deps:
-                line += f"{ruler}│"
+                cells.append("│")
             else:
-                line += ruler * 2
+                cells.append(ruler)
+        cells.append("  " * (len(depending) - end))
 
-        print(line)
+        print("".join(cells))
 
 
 def dot_escape_string(s: str) -> str:
     return s.replace("\\", "\\\\").replace('"', '\\"')
 
 
-def depends_dot(args: argparse.Namespace, patches: list[Changeset], depends: dict[Changeset, dict[Changeset, Depend]]) -> str:
+# Wraps node labels in the dot graph. Shared by all nodes, rather than
+# having textwrap.wrap set up a new wrapper for every label
+DOT_LABEL_WRAPPER = textwrap.TextWrapper(width=25)
+
+
+def depends_dot(args: argparse.Namespace, patches: list[Changeset], depends: dict[Changeset, dict[Changeset, Depend]],
+                write: Callable[[str], object]) -> None:
     """
-    Returns dot code for the dependency graph.
+    Writes dot code for the dependency graph, piece by piece, using the
+    given write function (e.g. sys.stdout.write), so the graph never
+    needs to be built as a single string.
     """
     # Seems that 'fdp' gives the best clustering if patches are often independent
-    res = """
+    write("""
 digraph ConflictMap {
 node [shape=box]
 layout=neato
 overlap=scale
-"""
+""")
 
     if args.randomize:
-        res += "start=random\n"
+        write("start=random\n")
 
+    # The position of every patch is also its node id
+    number = patch_numbers(patches)
     for i, p in enumerate(patches):
         label = dot_escape_string(str(p))
-        label = "\\n".join(textwrap.wrap(label, 25))
-        res += f'{i} [label="{label}"]\n'
-        for dep, v in depends[p].items():
-            res += f"{patches.index(dep)} -> {i} [style={v.dotstyle}]\n"
-    res += "}\n"
+        label = "\\n".join(DOT_LABEL_WRAPPER.wrap(label))
+        write(f'{i} [label="{label}"]\n')
+        for dep, v in depends.get(p, {}).items():
+            write(f"{number[dep]} -> {i} [style={v.dotstyle}]\n")
+    write("}\n")
 
-    return res
 
-
-def show_xdot(dot: str) -> None:
+def show_xdot(args: argparse.Namespace, patches: list[Changeset], depends: dict[Changeset, dict[Changeset, Depend]]) -> None:
     """
-    Shows a given dot graph in xdot
+    Shows the dependency graph in xdot, writing the dot code directly
+    into its stdin
     """
-    subprocess.run(['xdot', '/dev/stdin'], input=dot.encode(), check=True)
+    with subprocess.Popen(['xdot', '/dev/stdin'], stdin=subprocess.PIPE, encoding='utf-8') as proc:
+        assert proc.stdin is not None
+        # If xdot exits without reading the entire graph, writing or
+        # flushing the rest fails. Its exit status below tells why.
+        try:
+            depends_dot(args, patches, depends, proc.stdin.write)
+        except BrokenPipeError:
+            pass
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, proc.args)
 
 
 class ByFileAnalyzer:
-    def analyze(self, args: argparse.Namespace, patches: list[Changeset]) -> dict[Changeset, dict[Changeset, Depend]]:
+    def analyze(self, args: argparse.Namespace, patches: Iterable[Changeset]) -> dict[Changeset, dict[Changeset, Depend]]:
         """
         Find dependencies in a list of patches by looking at the files they
         change.
@@ -242,22 +357,27 @@ class ByFileAnalyzer:
         depends: dict[Changeset, dict[Changeset, Depend]] = collections.defaultdict(dict)
 
         for patch in patches:
-            for f in patch.get_patch_set():
-                for other in touches_file[f.path]:
-                    depends[patch][other] = Depend.FILENAME
+            # Only the filenames are needed, not the hunks. A patch can
+            # list the same file more than once (e.g. a concatenation of
+            # several diffs), so take every file once, or the patch
+            # would end up depending on itself
+            for path in dict.fromkeys(patch.get_paths()):
+                # Let the dict add all earlier patches in one go, rather
+                # than looping over them in Python
+                depends[patch].update(dict.fromkeys(touches_file[path], Depend.FILENAME))
 
-                touches_file[f.path].append(patch)
+                touches_file[path].append(patch)
 
         if 'blame' in args.actions:
             for path, ps in touches_file.items():
                 patch = ps[-1]
                 print(f"{patch!s:80.80} {path}")
 
-        return depends
+        return nonempty_depends(depends)
 
 
 class ByLineAnalyzer:
-    def analyze(self, args: argparse.Namespace, patches: list[Changeset]) -> dict[Changeset, dict[Changeset, Depend]]:
+    def analyze(self, args: argparse.Namespace, patches: Iterable[Changeset]) -> dict[Changeset, dict[Changeset, Depend]]:
         """
         Find dependencies in a list of patches by looking at the lines they
         change.
@@ -272,16 +392,22 @@ class ByLineAnalyzer:
 
         for patch in patches:
             for f in patch.get_patch_set():
-                if f.path not in state:
-                    state[f.path] = ByLineFileAnalyzer(f.path, args.proximity)
+                file_analyzer = state.get(f.path)
+                if file_analyzer is None:
+                    file_analyzer = state[f.path] = ByLineFileAnalyzer(f.path, args.proximity)
 
-                state[f.path].analyze(depends, patch, f)
+                file_analyzer.analyze(depends, patch, f)
 
         if 'blame' in args.actions:
             for a in state.values():
                 a.print_blame()
 
-        return depends
+        return nonempty_depends(depends)
+
+
+# Sort key of line states, created once since line_state bisects with
+# it for every line of every hunk
+LINENO = operator.attrgetter('lineno')
 
 
 class ByLineFileAnalyzer:
@@ -322,16 +448,17 @@ class ByLineFileAnalyzer:
         new empty state if it is not yet present and create is True.
         """
 
-        self.processed_idx += 1
-        for state in self.line_list[self.processed_idx:]:
+        # All states after the last processed one still use source line
+        # numbers and are sorted, so binary search for the first one
+        # that is not before lineno
+        self.processed_idx = bisect.bisect_left(self.line_list, lineno,
+                                                lo=self.processed_idx + 1,
+                                                key=LINENO)
+        if self.processed_idx < len(self.line_list):
+            state = self.line_list[self.processed_idx]
             # Found it, return
             if state.lineno == lineno:
                 return state
-            # It's not in there, stop looking
-            if state.lineno > lineno:
-                break
-            # We're already passed this one, continue looking
-            self.processed_idx += 1
 
         if not create:
             return None
@@ -352,47 +479,60 @@ class ByLineFileAnalyzer:
         before changing it.
         """
 
-        for state in self.line_list[self.to_update_idx:self.processed_idx]:
-            state.lineno += self.offset
-            self.to_update_idx += 1
+        # With a zero offset, source and target line numbers are the
+        # same, so there is nothing to renumber
+        if self.offset:
+            for state in self.line_list[self.to_update_idx:self.processed_idx]:
+                state.lineno += self.offset
+        self.to_update_idx += max(self.processed_idx - self.to_update_idx, 0)
 
         self.offset += amount
 
     def analyze_hunk(self, depends: dict[Changeset, dict[Changeset, Depend]], patch: Changeset, hunk: Hunk) -> None:
         #print('\n'.join(map(str, self.line_list)))
         #print('--')
+        # This runs for every line of every hunk, so keep things used
+        # in the loop in local variables (line_list is only ever
+        # modified in place, so this stays valid)
+        line_list = self.line_list
+        proximity = self.proximity
+        # Enum members are singletons, so compare them by identity
+        ADD, DELETE, CONTEXT = LineType.ADD, LineType.DELETE, LineType.CONTEXT
+        patch_depends = depends[patch]
         for change in hunk.changes:
+            action = change.action
+            source_lineno = change.source_lineno_abs
             # When adding a line, don't bother creating a new line
             # state, since we'll be adding one anyway (this prevents
             # extra unused linestates)
-            create = change.action != LineType.ADD
-            line_state = self.line_state(change.source_lineno_abs, create)
+            create = action is not ADD
+            line_state = self.line_state(source_lineno, create)
 
             # When changing a line, claim proximity lines before it as
             # well.
-            if change.action != LineType.CONTEXT and self.proximity != 0:
+            if action is not CONTEXT and proximity != 0:
                 # i points to the only linestate that could contain the
                 # state for lineno
                 i = self.processed_idx - 1
-                lineno = change.source_lineno_abs - 1
-                while (change.source_lineno_abs - lineno <= self.proximity and
+                lineno = source_lineno - 1
+                while (source_lineno - lineno <= proximity and
                        lineno > 0):
                     if (i < 0 or
                         i >= self.to_update_idx and
-                        self.line_list[i].lineno < lineno or
+                        line_list[i].lineno < lineno or
                         i < self.to_update_idx and
-                        self.line_list[i].lineno - self.offset < lineno):
+                        line_list[i].lineno - self.offset < lineno):
                             # This line does not exist yet, i points to an
                             # earlier line. Insert it
                             # _after_ i.
-                            self.line_list.insert(i + 1, self.LineState(lineno))
+                            line_list.insert(i + 1, self.LineState(lineno))
                             # Point i at the inserted line
                             i += 1
                             self.processed_idx += 1
                             assert i >= self.to_update_idx, "Inserting before already updated line"
 
                     # Claim this line
-                    s = self.line_list[i]
+                    s = line_list[i]
 
                     # Already claimed, stop looking. This should also
                     # prevent us from i becoming < to_update_idx - 1,
@@ -401,25 +541,28 @@ class ByLineFileAnalyzer:
                     if patch in s.proximity or s.changed_by == patch:
                         break
 
-                    s.proximity.add(patch)
+                    prox = s.proximity
+                    if not isinstance(prox, set):
+                        prox = s.proximity = set()
+                    prox.add(patch)
                     i -= 1
                     lineno -= 1
 
             # For changes that know about the contents of the old line,
             # check if it matches our observations
-            if change.action != LineType.ADD:
+            if action is not ADD:
                 assert line_state is not None
                 if line_state.line is not None and change.source_line != line_state.line:
                     sys.exit(
                         f"While processing {patch}\n"
                         "Warning: patch does not apply cleanly! Results are probably wrong!\n"
-                        f"According to previous patches, line {change.source_lineno_abs} is:\n"
+                        f"According to previous patches, line {source_lineno} is:\n"
                         f"{line_state.line}\n"
                         f"But according to {patch}, it should be:\n"
                         f"{change.source_line}\n\n",
                     )
 
-            if change.action == LineType.CONTEXT:
+            if action is CONTEXT:
                 assert line_state is not None
                 if line_state.line is None:
                     line_state.line = change.target_line
@@ -428,14 +571,14 @@ class ByLineFileAnalyzer:
                 #claim_after(in_change, change.
                 #in_change = False
 
-            elif change.action == LineType.ADD:
+            elif action is ADD:
                 self.update_offset(1)
 
                 # Mark this line as changed by this patch
                 s = self.LineState(lineno=change.target_lineno_abs,
                                    line=change.target_line,
                                    changed_by=patch)
-                self.line_list.insert(self.processed_idx, s)
+                line_list.insert(self.processed_idx, s)
                 assert self.processed_idx == self.to_update_idx, "Not everything updated?"
 
                 # Since we insert this using the target line number, it
@@ -447,19 +590,20 @@ class ByLineFileAnalyzer:
                 # an 'add' change, since we don't actually touch any
                 # existing code
                 if line_state:
-                    deps = itertools.chain(line_state.proximity,
-                                           [line_state.changed_by])
-                    for p in deps:
-                        if p and p not in depends[patch] and p != patch:
-                            depends[patch][p] = Depend.PROXIMITY
-
-            elif change.action == LineType.DELETE:
+                    for p in line_state.proximity:
+                        if p not in patch_depends and p != patch:
+                            patch_depends[p] = Depend.PROXIMITY
+                    changed_by = line_state.changed_by
+                    if changed_by and changed_by not in patch_depends and changed_by != patch:
+                        patch_depends[changed_by] = Depend.PROXIMITY
+
+            elif action is DELETE:
                 assert line_state is not None
                 self.update_offset(-1)
 
                 # This file was touched by another patch, add dependency
                 if line_state.changed_by:
-                    depends[patch][line_state.changed_by] = Depend.HARD
+                    patch_depends[line_state.changed_by] = Depend.HARD
                     # TODO(PHH): Assigning to singleton Depend.*.dottooltip; unused by `depends_dot`
                     # https://graphviz.org/docs/attrs/tooltip/
                     # depends[patch][line_state.changed_by].dottooltip = f"-{change.source_line}"
@@ -467,29 +611,33 @@ class ByLineFileAnalyzer:
                 # Also add proximity deps for patches that touched code
                 # around this line
                 for p in line_state.proximity:
-                    if (p not in depends[patch]) and p != patch:
-                        depends[patch][p] = Depend.PROXIMITY
+                    if (p not in patch_depends) and p != patch:
+                        patch_depends[p] = Depend.PROXIMITY
 
                 # Forget about the state for this source line
-                del self.line_list[self.processed_idx]
+                del line_list[self.processed_idx]
                 self.processed_idx -= 1
 
             # After changing a line, claim proximity lines after it as well.
-            if change.action != LineType.CONTEXT and self.proximity != 0:
+            if action is not CONTEXT and proximity != 0:
                 # i points to the only linestate that could contain the
                 # state for lineno
                 i = self.to_update_idx
                 # When a file is created, the source line for the adds is 0...
-                lineno = change.source_lineno_abs or 1
-                while (lineno - change.source_lineno_abs < self.proximity):
-                    if i >= len(self.line_list) or self.line_list[i].lineno > lineno:
+                lineno = source_lineno or 1
+                while (lineno - source_lineno < proximity):
+                    if i >= len(line_list) or line_list[i].lineno > lineno:
                         # This line does not exist yet, i points to an
                         # later line. Insert it _before_ i.
-                        self.line_list.insert(i, self.LineState(lineno))
+                        line_list.insert(i, self.LineState(lineno))
                         assert i > self.processed_idx, "Inserting before already processed line"
 
                     # Claim this line
-                    self.line_list[i].proximity.add(patch)
+                    s = line_list[i]
+                    prox = s.proximity
+                    if not isinstance(prox, set):
+                        prox = s.proximity = set()
+                    prox.add(patch)
 
                     i += 1
                     lineno += 1
@@ -512,12 +660,21 @@ class ByLineFileAnalyzer:
 
     class LineState:
         """ State of a particular line in a file """
+        # There is one of these for every tracked line of every file,
+        # so avoid a per-instance __dict__
+        __slots__ = ('lineno', 'line', 'changed_by', 'proximity')
+
+        # Most line states are never claimed by any patch, so they all
+        # share this instead of each having their own empty set. A
+        # real set is only created when a patch claims the line.
+        NO_PROXIMITY: frozenset[Changeset] = frozenset()
+
         def __init__(self, lineno: int, line: str | None = None, changed_by: Changeset | None = None) -> None:
             self.lineno = lineno
             self.line = line
             self.changed_by = changed_by
             # Set of patches that changed lines near this one
-            self.proximity: set[Changeset] = set()
+            self.proximity: set[Changeset] | frozenset[Changeset] = self.NO_PROXIMITY
 
         def __str__(self) -> str:
             return f"{self.lineno}: changed by {self.changed_by}: {self.line}"
@@ -529,7 +686,7 @@ def parse_args() -> argparse.Namespace:
     types = parser.add_argument_group('type').add_mutually_exclusive_group(required=True)
     types.add_argument('--git', dest='changeset_type', action='store_const',
                    const=GitRev,
-                   help='Analyze a list of git revisions (non-option arguments are passed git git rev-list as-is')
+                   help='Analyze a list of git revisions (non-option arguments are passed to git log as-is')
     types.add_argument('--patches', dest='changeset_type', action='store_const',
                    const=PatchFile,
                    help='Analyze a list of patch files (non-option arguments are patch filenames')
@@ -537,7 +694,7 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument('arguments', metavar="ARG", nargs='*', help="""
                         Specification of patches to analyze, depending
                         on the type given. When --git is given, this is
-                        passed to git rev-list as-is (so use a valid
+                        passed to git log as-is (so use a valid
                         revision range, like HEAD^^..HEAD). When
                         --patches is given, these are filenames of patch
                         files.""")
@@ -593,9 +750,16 @@ def parse_args() -> argparse.Namespace:
 def main() -> None:
     args = parse_args()
 
-    patches: list[Changeset] = list(args.changeset_type.get_changesets(args.arguments))
+    patches: list[Changeset] = []
+
+    def read_patches() -> Iterator[Changeset]:
+        # Hand patches to the analyzer as soon as they are read, so
+        # it can work while git is still producing the later diffs
+        for patch in args.changeset_type.get_changesets(args.arguments):
+            patches.append(patch)
+            yield patch
 
-    depends = args.analyzer().analyze(args, patches)
+    depends = args.analyzer().analyze(args, read_patches())
 
     if 'list' in args.actions:
         print_depends(patches, depends)
@@ -607,10 +771,10 @@ def main() -> None:
         print_depends_tsort(patches, depends)
 
     if 'dot' in args.actions:
-        print(depends_dot(args, patches, depends))
+        depends_dot(args, patches, depends, sys.stdout.write)
 
     if 'xdot' in args.actions:
-        show_xdot(depends_dot(args, patches, depends))
+        show_xdot(args, patches, depends)
 
 
 if __name__ == "__main__":